@@ -7,199 +7,452 @@ st.set_page_config(layout="wide", page_title="テキストマイニングツー
 # --- ライブラリのインポート ---
 import MeCab
 import pandas as pd
-from collections import Counter
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm # matplotlibのフォント管理
 import networkx as nx
-from pyvis.network import Network
+import json
+import io
 import re
 import os
+import threading
 import numpy as np
-from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor
 # from IPython.core.display import HTML # Streamlitでは st.components.v1.html を使用
 
 # --- 定数定義 ---
 MECABRC_PATH = "/etc/mecabrc"
 DICTIONARY_PATH = "/var/lib/mecab/dic/ipadic-utf8"
 TAGGER_OPTIONS = f"-r {MECABRC_PATH} -d {DICTIONARY_PATH}"
-FONT_PATH_PRIMARY = '/usr/share/fonts/opentype/ipafont-gothic/ipagp.ttf' 
+FONT_PATH_PRIMARY = '/usr/share/fonts/opentype/ipafont-gothic/ipagp.ttf'
+# リランごとのreモジュールキャッシュ照会を避けるため、パターンはモジュールロード時に一度だけコンパイルする
+STOPWORD_SPLIT_RE = re.compile(r'[,\n]')
+SENTENCE_BOUNDARY_RE = re.compile(r'[。\n！？]')
+# これ未満の文字数ではスレッド起動コストが並列化の利得を上回る
+PARALLEL_PARSE_MIN_CHARS = 50_000
 
 # --- MeCab Taggerの初期化 (キャッシュ利用) ---
 @st.cache_resource
 def initialize_mecab_tagger():
+    # cache_resourceの関数本体はキャッシュミス時しか実行されないため、
+    # st.session_stateへの書き込み等のセッション単位の副作用はここに置かない
+    # （ウォームなワーカーでは新規セッションでフラグが立たなくなる）
     try:
         tagger_obj = MeCab.Tagger(TAGGER_OPTIONS)
-        tagger_obj.parse('') 
-        st.session_state['mecab_tagger_initialized'] = True
+        tagger_obj.parse('')
         print("MeCab Tagger initialized successfully via cache.")
         return tagger_obj
     except Exception as e_init:
         st.error(f"MeCab Taggerの初期化に失敗しました: {e_init}")
         st.error("リポジトリに `packages.txt` が正しく設定され、MeCab関連パッケージがインストールされるか確認してください。")
-        st.session_state['mecab_tagger_initialized'] = False
         return None
 
 tagger = initialize_mecab_tagger()
+st.session_state['mecab_tagger_initialized'] = tagger is not None
+
+# 並列解析用: Taggerは共有せず、ワーカースレッドごとに専用インスタンスを持たせる
+_thread_local_taggers = threading.local()
+
+def _get_thread_tagger():
+    tagger_obj = getattr(_thread_local_taggers, 'tagger', None)
+    if tagger_obj is None:
+        tagger_obj = MeCab.Tagger(TAGGER_OPTIONS)
+        tagger_obj.parse('')
+        _thread_local_taggers.tagger = tagger_obj
+    return tagger_obj
+
+def _split_text_for_parallel_parse(text_input, n_chunks):
+    # 形態素列が変わらないよう、文末文字の直後でのみ分割する（区切り文字も保持）
+    chunk_size = max(1, len(text_input) // n_chunks)
+    chunks = []; start = 0
+    for k in range(1, n_chunks):
+        boundary_match = SENTENCE_BOUNDARY_RE.search(text_input, max(start, k * chunk_size))
+        if boundary_match is None: break
+        chunks.append(text_input[start:boundary_match.end()]); start = boundary_match.end()
+    if start < len(text_input): chunks.append(text_input[start:])
+    return chunks
+
+@st.cache_resource
+def find_fallback_japanese_font():
+    # fm.fontManager.ttflistはシステム上の全フォントを走査するため、
+    # セッションごとではなくワーカーごとに一度だけ検索する
+    font_names_ja = [f.name for f in fm.fontManager.ttflist if any(lang in f.name.lower() for lang in ['ipagp', 'ipag', 'takao', 'noto sans cjk jp', 'hiragino'])]
+    if not font_names_ja:
+        return None, None
+    return font_names_ja[0], fm.findfont(fm.FontProperties(family=font_names_ja[0]))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def font_file_exists(font_path):
+    # フォントファイルの存在確認はリランごとにstatしない
+    # （ttl付きなので、フォント追加後もアプリ再起動なしで反映される）
+    return font_path is not None and os.path.exists(font_path)
 
 # --- フォントパスの決定とMatplotlibへの設定 ---
-FONT_PATH_FINAL = None
-if 'mecab_tagger_initialized' in st.session_state and st.session_state['mecab_tagger_initialized']:
-    if os.path.exists(FONT_PATH_PRIMARY):
-        FONT_PATH_FINAL = FONT_PATH_PRIMARY
-        st.sidebar.info(f"日本語フォント: {os.path.basename(FONT_PATH_FINAL)}")
+@st.cache_resource
+def setup_matplotlib_font():
+    # FontEntry登録・ttflist走査・rcParams設定はプロセスごとに一度で十分。
+    # サイドバーへの表示はリランごとに必要なので、ここでは(パス, フォント名, エラー文)
+    # のタプルだけを返し、メッセージ表示は呼び出し側で行う
+    if font_file_exists(FONT_PATH_PRIMARY):
         try:
-            font_entry = fm.FontEntry(fname=FONT_PATH_FINAL, name=os.path.splitext(os.path.basename(FONT_PATH_FINAL))[0])
+            font_entry = fm.FontEntry(fname=FONT_PATH_PRIMARY, name=os.path.splitext(os.path.basename(FONT_PATH_PRIMARY))[0])
             if font_entry.name not in [f.name for f in fm.fontManager.ttflist]:
                  fm.fontManager.ttflist.append(font_entry)
             plt.rcParams['font.family'] = font_entry.name
             print(f"Matplotlibのフォントとして {font_entry.name} を設定しました。")
+            return FONT_PATH_PRIMARY, font_entry.name, None
         except Exception as e_font_setting:
-            st.sidebar.error(f"Matplotlibフォント設定エラー: {e_font_setting}")
-    else:
-        st.sidebar.error(f"指定IPAフォント '{FONT_PATH_PRIMARY}' が見つかりません。")
-        try:
-            font_names_ja = [f.name for f in fm.fontManager.ttflist if any(lang in f.name.lower() for lang in ['ipagp', 'ipag', 'takao', 'noto sans cjk jp', 'hiragino'])]
-            if font_names_ja:
-                FONT_PATH_FINAL = fm.findfont(fm.FontProperties(family=font_names_ja[0]))
-                plt.rcParams['font.family'] = font_names_ja[0]
-                st.sidebar.info(f"代替日本語フォントとして '{font_names_ja[0]}' ({FONT_PATH_FINAL}) を使用します。")
-                print(f"Matplotlibの代替フォントとして {font_names_ja[0]} を設定しました。")
-            else:
-                 st.sidebar.error("利用可能な日本語フォントがMatplotlibで見つかりません。")
-        except Exception as e_alt_font:
-            st.sidebar.error(f"代替フォント検索中にエラー: {e_alt_font}")
+            return FONT_PATH_PRIMARY, None, f"Matplotlibフォント設定エラー: {e_font_setting}"
+    try:
+        fallback_font_name, fallback_font_path = find_fallback_japanese_font()
+        if fallback_font_name:
+            plt.rcParams['font.family'] = fallback_font_name
+            print(f"Matplotlibの代替フォントとして {fallback_font_name} を設定しました。")
+            return fallback_font_path, fallback_font_name, f"指定IPAフォント '{FONT_PATH_PRIMARY}' が見つかりません。代替フォントを使用します。"
+        return None, None, f"指定IPAフォント '{FONT_PATH_PRIMARY}' が見つからず、利用可能な日本語フォントもMatplotlibで見つかりません。"
+    except Exception as e_alt_font:
+        return None, None, f"代替フォント検索中にエラー: {e_alt_font}"
+
+FONT_PATH_FINAL = None
+if st.session_state.get('mecab_tagger_initialized', False):
+    FONT_PATH_FINAL, font_family_name_final, font_error_message = setup_matplotlib_font()
+    if font_error_message: st.sidebar.error(font_error_message)
+    if FONT_PATH_FINAL is not None:
+        if FONT_PATH_FINAL == FONT_PATH_PRIMARY:
+            st.sidebar.info(f"日本語フォント: {os.path.basename(FONT_PATH_FINAL)}")
+        else:
+            st.sidebar.info(f"代替日本語フォントとして '{font_family_name_final}' ({FONT_PATH_FINAL}) を使用します。")
 else:
-    if 'mecab_tagger_initialized' in st.session_state and not st.session_state.get('mecab_tagger_initialized', False) :
-        st.sidebar.error("MeCabが初期化されていないためフォント設定をスキップします。")
+    st.sidebar.error("MeCabが初期化されていないためフォント設定をスキップします。")
+# タブのキャプション等で繰り返し参照するため、basenameは一度だけ計算しておく
+FONT_BASENAME_FINAL = os.path.basename(FONT_PATH_FINAL) if FONT_PATH_FINAL else '未設定'
 
 
 # --- 分析関数の定義 ---
-def perform_morphological_analysis(text_input, tagger_instance):
-    if tagger_instance is None or not text_input: return []
-    all_morphemes = []
-    node = tagger_instance.parseToNode(text_input)
-    while node:
-        if node.surface:
-            features = node.feature.split(',')
-            all_morphemes.append({
-                '表層形': node.surface, '原形': features[6] if features[6] != '*' else node.surface,
-                '品詞': features[0], '品詞細分類1': features[1], '品詞細分類2': features[2],
-                '品詞細分類3': features[3], '活用型': features[4], '活用形': features[5],
-                '読み': features[7] if len(features) > 7 and features[7] != '*' else '',
-                '発音': features[8] if len(features) > 8 and features[8] != '*' else ''
-            })
-        node = node.next
-    return all_morphemes
-
-def generate_word_report(all_morphemes, target_pos_list, stop_words_set):
-    if not all_morphemes: 
+MORPHEME_COLUMNS = ['表層形', '原形', '品詞', '品詞細分類1']
+# 品詞細分類2以降や活用の情報はどの分析でも参照しないためデフォルトでは保持しない
+# （include_details=True / include_phonetic=True で有効化）
+MORPHEME_DETAIL_COLUMNS = ['品詞細分類2', '品詞細分類3', '活用型', '活用形']
+MORPHEME_PHONETIC_COLUMNS = ['読み', '発音']
+# レポート・共起ネットワークで除外する名詞の品詞細分類（ワードクラウドはやや緩め）
+NOUN_EXCLUDE_SUBCATEGORIES = frozenset({'非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能'})
+NOUN_EXCLUDE_SUBCATEGORIES_WC = frozenset({'数', '非自立', '代名詞', '接尾'})
+# 単語出現レポートで既定表示する上位語数
+REPORT_TOP_K_DEFAULT = 500
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def perform_morphological_analysis(text_input, include_details=False, include_phonetic=False):
+    # テキストが同じ限り再解析しない（スライダー操作等のリラン時はキャッシュヒット）
+    # 結果は列指向のDataFrame（トークンごとのdictより省メモリで、後段のフィルタをベクトル化できる）
+    columns = list(MORPHEME_COLUMNS)
+    if include_details: columns += MORPHEME_DETAIL_COLUMNS
+    if include_phonetic: columns += MORPHEME_PHONETIC_COLUMNS
+    tagger_instance = initialize_mecab_tagger()
+    if tagger_instance is None or not text_input:
+        return pd.DataFrame(columns=columns)
+    # parseToNodeのノード走査はノードごとにSWIG境界を越えるため、
+    # テキスト出力を一括で受け取ってPython側で行分割する方が速い。
+    # 大きな入力は文境界でチャンク分割し、スレッドごとのTaggerで並列に解析する
+    n_workers = os.cpu_count() or 1
+    if len(text_input) >= PARALLEL_PARSE_MIN_CHARS and n_workers > 1:
+        chunks = _split_text_for_parallel_parse(text_input, n_workers)
+        with ThreadPoolExecutor(max_workers=n_workers) as executor:
+            raw_outputs = list(executor.map(lambda chunk: _get_thread_tagger().parse(chunk), chunks))
+    else:
+        raw_outputs = [tagger_instance.parse(text_input)]
+    morpheme_lines = []; eos_line_positions = []
+    for raw_output in raw_outputs:
+        for line in raw_output.split('\n'):
+            if not line: continue
+            if line == 'EOS':
+                # 入力中の改行は表層形のトークンにならず行単位のEOSになるため、
+                # 文境界として使えるよう出現位置（次トークンの行位置）を記録しておく
+                eos_line_positions.append(len(morpheme_lines)); continue
+            morpheme_lines.append(line)
+    if not morpheme_lines:
+        return pd.DataFrame(columns=columns)
+    # 行のパースはPythonの行ループではなく、pandasのC実装のstrベクトル演算で一括処理する。
+    # 素性文字列の重複はこの後のcategory化が正準化するため、行ごとのinternは不要になった
+    parts = pd.Series(morpheme_lines, dtype=object).str.partition('\t')
+    has_features = (parts[2] != '').to_numpy()
+    surfaces = parts[0].to_numpy()[has_features]
+    # nで使用するフィールド数までに分割を制限する（辞書が追加素性を持つ場合の余分な割り当てを防ぐ）
+    features = parts.loc[has_features, 2].str.split(',', n=8 if include_phonetic else 7, expand=True).reset_index(drop=True)
+    # 未知語は素性が7フィールドに満たないことがあるため、欠けた列は欠損として補う
+    for missing_col in range(features.shape[1], 9 if include_phonetic else 7):
+        features[missing_col] = None
+    base_features = features[6].to_numpy()
+    bases = np.where(pd.notna(base_features) & (base_features != '*'), base_features, surfaces)
+    data = {'表層形': surfaces, '原形': bases, '品詞': features[0].to_numpy(), '品詞細分類1': features[1].to_numpy()}
+    if include_details:
+        for column, feature_idx in zip(MORPHEME_DETAIL_COLUMNS, (2, 3, 4, 5)):
+            data[column] = features[feature_idx].to_numpy()
+    if include_phonetic:
+        for column, feature_idx in zip(MORPHEME_PHONETIC_COLUMNS, (7, 8)):
+            values = features[feature_idx].to_numpy()
+            data[column] = np.where(pd.notna(values) & (values != '*'), values, '')
+    morphemes_df = pd.DataFrame(data, columns=columns)
+    # 品詞・活用の列は取りうる値が十数種類しかないため、category化して
+    # ポインタ列を小さな整数コード列に圧縮する（isin等のマスクも速くなる）
+    categorical_columns = ['品詞', '品詞細分類1'] + (MORPHEME_DETAIL_COLUMNS if include_details else [])
+    for column in categorical_columns:
+        morphemes_df[column] = morphemes_df[column].astype('category')
+    # EOSの行位置を素性なし行の除外後のトークンインデックスへ写像し、
+    # DataFrameに添えて返す（attrsはst.cache_dataのpickleでも保持される）
+    kept_counts = np.concatenate(([0], np.cumsum(has_features)))
+    morphemes_df.attrs['eos_boundaries'] = tuple(
+        int(b) for b in np.unique(kept_counts[np.asarray(eos_line_positions, dtype=np.int64)]))
+    return morphemes_df
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def get_morpheme_filter_mask(text_input, target_pos_list, stop_words_set, exclude_subcategories, enforce_min_length=False):
+    # レポート/ワードクラウド/共起ネットワークのほぼ同一なフィルタを
+    # 条件の組ごとに一度だけ計算して共有する。
+    # フィルタはPythonループではなくベクトル化したブールマスクで一括適用
+    # （ストップワードは入力時に小文字化済みなので、原形側も小文字化して比較する）
+    morphemes_df = perform_morphological_analysis(text_input)
+    mask = morphemes_df['品詞'].isin(target_pos_list) & ~morphemes_df['原形'].str.lower().isin(stop_words_set)
+    mask &= ~((morphemes_df['品詞'] == '名詞') & morphemes_df['品詞細分類1'].isin(exclude_subcategories))
+    if enforce_min_length:
+        # 名詞以外の1文字語はノイズになりやすいので共起ネットワークでは除く
+        mask &= (morphemes_df['原形'].str.len() >= 2) | (morphemes_df['品詞'] == '名詞')
+    return mask.to_numpy()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def generate_word_report(text_input, target_pos_list, stop_words_set, top_k=None):
+    # キャッシュキーが安定するよう、呼び出し側は品詞リストをtuple、
+    # ストップワードをfrozensetにして渡すこと
+    morphemes_df = perform_morphological_analysis(text_input)
+    if morphemes_df.empty:
         return pd.DataFrame(), 0, 0
-    
-    report_target_morphemes = []
-    for m in all_morphemes:
-        if m['品詞'] in target_pos_list and m['原形'] not in stop_words_set:
-            if m['品詞'] == '名詞' and m['品詞細分類1'] in ['非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能']:
-                continue
-            report_target_morphemes.append(m)
-
-    if not report_target_morphemes: 
-        return pd.DataFrame(), len(all_morphemes), 0
-        
-    word_counts = Counter(m['原形'] for m in report_target_morphemes)
-    report_data = []
-    
-    representative_info_for_report = {}
-    for m in reversed(report_target_morphemes): 
-        if m['原形'] not in representative_info_for_report:
-            representative_info_for_report[m['原形']] = {'品詞': m['品詞']} 
-            
-    total_all_morphemes_count_for_freq = len(all_morphemes)
-    total_report_target_morphemes_count = sum(word_counts.values())
-
-    for rank, (word, count) in enumerate(word_counts.most_common(), 1):
-        info = representative_info_for_report.get(word, {}) 
-        frequency = (count / total_all_morphemes_count_for_freq) * 100 if total_all_morphemes_count_for_freq > 0 else 0
-        report_data.append({
-            '順位': rank,
-            '単語 (原形)': word,
-            '出現数': count,
-            '出現頻度 (%)': round(frequency, 3),
-            '品詞': info.get('品詞', '')
-            # '品詞細分類1', '代表的な表層形', '代表的な読み' は削除済み
-        })
-    return pd.DataFrame(report_data), total_all_morphemes_count_for_freq, total_report_target_morphemes_count
-
-def generate_wordcloud_image(all_morphemes, font_path_wc, target_pos_list, stop_words_set):
-    if not all_morphemes: st.info("ワードクラウド生成のための形態素データがありません。"); return None
-    if font_path_wc is None or not os.path.exists(font_path_wc): st.error(f"ワードクラウド生成に必要な日本語フォントパス '{font_path_wc}' が見つかりません。"); return None
-    wordcloud_words = []
-    for m in all_morphemes:
-        if m['品詞'] in target_pos_list and m['原形'] not in stop_words_set:
-            if m['品詞'] == '名詞' and m['品詞細分類1'] in ['数', '非自立', '代名詞', '接尾']: continue
-            wordcloud_words.append(m['原形'])
-    wordcloud_text_input_str = " ".join(wordcloud_words)
-    if not wordcloud_text_input_str.strip(): st.info("ワードクラウド表示対象の単語が見つかりませんでした（フィルタリング後）。"); return None
+
+    mask = get_morpheme_filter_mask(text_input, target_pos_list, stop_words_set, NOUN_EXCLUDE_SUBCATEGORIES)
+    filtered_df = morphemes_df.loc[mask]
+
+    if filtered_df.empty:
+        return pd.DataFrame(), len(morphemes_df), 0
+
+    # 集計はCounterではなくC実装のvalue_counts（出現数の降順でソート済み）
+    word_counts = filtered_df['原形'].value_counts()
+    # 表示は通常上位しか見ないので、top_k指定時は表の構築自体を上位に絞る
+    # （延べ語数などの集計は絞り込み前の全体で行う）
+    total_report_target_morphemes_count = int(word_counts.sum())
+    if top_k is not None:
+        word_counts = word_counts.head(top_k)
+
+    # 単語ごとの代表品詞は初出の形態素のものを採用する
+    # （品詞列はcategoryなので、欠損補完できるようobjectに戻してから辞書化する）
+    representative_pos_for_report = filtered_df.drop_duplicates('原形').set_index('原形')['品詞'].astype(object)
+
+    total_all_morphemes_count_for_freq = len(morphemes_df)
+
+    # 行ごとのdict生成をやめ、レポート表は列単位で一括構築する
+    # （'品詞細分類1', '代表的な表層形', '代表的な読み' は削除済み）
+    frequencies = word_counts.to_numpy() / total_all_morphemes_count_for_freq * 100
+    report_df = pd.DataFrame({
+        '順位': np.arange(1, len(word_counts) + 1),
+        '単語 (原形)': word_counts.index.to_numpy(),
+        '出現数': word_counts.to_numpy(),
+        '出現頻度 (%)': np.round(frequencies, 3),
+        '品詞': representative_pos_for_report.reindex(word_counts.index).fillna('').to_numpy(),
+    })
+    return report_df, total_all_morphemes_count_for_freq, total_report_target_morphemes_count
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def generate_wordcloud_image(text_input, font_path_wc, target_pos_list, stop_words_set):
+    morphemes_df = perform_morphological_analysis(text_input)
+    if morphemes_df.empty: st.info("ワードクラウド生成のための形態素データがありません。"); return None
+    if not font_file_exists(font_path_wc): st.error(f"ワードクラウド生成に必要な日本語フォントパス '{font_path_wc}' が見つかりません。"); return None
+    mask = get_morpheme_filter_mask(text_input, target_pos_list, stop_words_set, NOUN_EXCLUDE_SUBCATEGORIES_WC)
+    # 巨大な空白連結文字列を作ってWordCloud内部で再トークン化させるのではなく、
+    # 集計済みの頻度辞書から直接描画する
+    word_frequencies = morphemes_df.loc[mask, '原形'].value_counts().to_dict()
+    if not word_frequencies: st.info("ワードクラウド表示対象の単語が見つかりませんでした（フィルタリング後）。"); return None
     try:
-        wc = WordCloud(font_path=font_path_wc, background_color="white", width=800, height=400, max_words=200, collocations=False, random_state=42).generate(wordcloud_text_input_str)
-        fig, ax = plt.subplots(figsize=(12,6)); ax.imshow(wc, interpolation='bilinear'); ax.axis("off")
-        return fig
+        wc = WordCloud(font_path=font_path_wc, background_color="white", width=800, height=400, max_words=200, collocations=False, random_state=42).generate_from_frequencies(word_frequencies)
+        # PNGへエンコードしてバイト列をキャッシュ・表示する（生のピクセル配列より
+        # キャッシュが約1桁小さく、st.image側の再エンコードも不要になる）
+        png_buffer = io.BytesIO()
+        wc.to_image().save(png_buffer, format='PNG')
+        return png_buffer.getvalue()
     except Exception as e_wc: st.error(f"ワードクラウド画像生成中にエラーが発生しました: {e_wc}"); return None
 
-def generate_cooccurrence_network_html(all_morphemes, text_input_co, tagger_instance, font_path_co, target_pos_list, stop_words_set, node_min_freq, edge_min_freq):
-    if not all_morphemes or tagger_instance is None or not text_input_co.strip(): st.info("共起ネットワーク生成に必要なデータが不足しています。"); return None
-    if font_path_co is None or not os.path.exists(font_path_co): st.error(f"共起ネットワークのラベル表示に必要な日本語フォントパス '{font_path_co}' が見つかりません。"); return None
-    temp_words_for_nodes = []
-    for m in all_morphemes:
-        if m['品詞'] in target_pos_list and m['原形'] not in stop_words_set:
-            if m['品詞'] == '名詞' and m['品詞細分類1'] in ['非自立', '数', '代名詞', '接尾', 'サ変接続', '副詞可能']: continue
-            if len(m['原形']) < 2 and m['品詞'] != '名詞': continue
-            temp_words_for_nodes.append(m['原形'])
-    word_counts = Counter(temp_words_for_nodes); node_candidates = {word: count for word, count in word_counts.items() if count >= node_min_freq}
-    if len(node_candidates) < 2: st.info(f"共起ネットワークのノードとなる単語（フィルタ後）が2つ未満です。"); return None
-    sentences = re.split(r'[。\n！？]+', text_input_co); sentences = [s.strip() for s in sentences if s.strip()]
-    cooccurrence_counts_map = Counter()
-    for sentence in sentences:
-        node_s = tagger_instance.parseToNode(sentence); words_in_sentence = []
-        while node_s:
-            if node_s.surface:
-                features = node_s.feature.split(','); original_form = features[6] if features[6] != '*' else node_s.surface
-                if original_form in node_candidates: words_in_sentence.append(original_form)
-            node_s = node_s.next
-        for pair in combinations(sorted(list(set(words_in_sentence))), 2): cooccurrence_counts_map[pair] += 1
-    if not cooccurrence_counts_map: st.info("共起ペアが見つかりませんでした。"); return None
-    font_name_pyvis_graph = os.path.splitext(os.path.basename(font_path_co))[0]
-    if font_name_pyvis_graph.lower() == 'ipagp': font_name_pyvis_graph = 'IPAPGothic'
-    elif font_name_pyvis_graph.lower() == 'ipamp': font_name_pyvis_graph = 'IPAPMincho'
-    net_graph = Network(notebook=True, height="750px", width="100%", directed=False, bgcolor="#F5F5F5", font_color="#333333")
-    for word, count in node_candidates.items():
-        node_s_size = int(np.sqrt(count) * 10 + 10)
-        net_graph.add_node(word, label=word, size=node_s_size, title=f"{word} (出現数: {count})", font={'face': font_name_pyvis_graph, 'size': 14, 'color': '#333333'}, borderWidth=1, color={'border': '#666666', 'background': '#D2E5FF'})
-    added_edge_num = 0
-    for pair_nodes, freq_cooc in cooccurrence_counts_map.items():
-        if freq_cooc >= edge_min_freq:
-            edge_w = float(np.log1p(freq_cooc) * 1.5 + 0.5)
-            net_graph.add_edge(pair_nodes[0], pair_nodes[1], value=edge_w, title=f"共起: {freq_cooc}回", color={'color': '#cccccc', 'highlight': '#848484', 'opacity':0.6}); added_edge_num +=1
-    if added_edge_num == 0: st.info(f"表示対象の共起ペア（共起回数 {edge_min_freq} 回以上）がありませんでした。"); return None
-    options_js_str = """ var options = {"interaction": {"navigationButtons": false, "keyboard": {"enabled": false}}, "manipulation": {"enabled": false}, "configure": {"enabled": false}, "physics": {"enabled": true, "barnesHut": {"gravitationalConstant": -30000, "centralGravity": 0.1, "springLength": 150, "springConstant": 0.03, "damping": 0.09, "avoidOverlap": 0.5}, "solver": "barnesHut", "stabilization": {"iterations": 500}}}; """
-    try: net_graph.set_options(options_js_str)
-    except Exception as e_set_opt: st.warning(f"Pyvisオプション設定で軽微なエラー: {e_set_opt}")
-    net_graph.show_buttons(filter_=False)
-    return net_graph.generate_html(name="temp_cooc_net_streamlit.html", notebook=True)
-
-def perform_kwic_search(all_morphemes, keyword_str, search_key_type_str, window_int):
-    if not keyword_str.strip() or not all_morphemes: return []
+# 改行はMeCab出力では表層形に現れない（EOS行になる）ため、
+# 境界判定にはトークンの表層形とEOS位置の両方を使う
+SENTENCE_TERMINATORS = {'。', '！', '？'}
+
+# 共起ネットワーク描画用の固定HTMLシェル（vis.jsはpyvisと同じくCDNから読み込む）
+VIS_NETWORK_OPTIONS = {
+    "interaction": {"navigationButtons": False, "keyboard": {"enabled": False}},
+    "manipulation": {"enabled": False},
+    "configure": {"enabled": False},
+    "physics": {"enabled": True,
+                "barnesHut": {"gravitationalConstant": -30000, "centralGravity": 0.1, "springLength": 150,
+                              "springConstant": 0.03, "damping": 0.09, "avoidOverlap": 0.5},
+                "solver": "barnesHut", "stabilization": {"iterations": 500}},
+}
+
+VIS_NETWORK_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/standalone/umd/vis-network.min.js"></script>
+<style>#cooc_network {{ width: 100%; height: 750px; background-color: #F5F5F5; }}</style>
+</head>
+<body>
+<div id="cooc_network"></div>
+<script>
+  var nodes = new vis.DataSet({nodes_json});
+  var edges = new vis.DataSet({edges_json});
+  var container = document.getElementById("cooc_network");
+  var network = new vis.Network(container, {{nodes: nodes, edges: edges}}, {options_json});
+</script>
+</body>
+</html>
+"""
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_sentence_spans(text_input):
+    # 文区切り（形態素インデックスの範囲）はテキスト単位で一度だけ計算する
+    # （ノード/エッジ閾値スライダーの変更時はキャッシュヒット）
+    morphemes_df = perform_morphological_analysis(text_input)
+    surfaces = morphemes_df['表層形'].to_numpy()
+    # 改行由来の文境界（解析時に記録したEOS位置）。トークンを消費しない境界なので、
+    # 句読点トークンと違い次の文はその位置のトークンから始まる
+    eos_boundaries = set(morphemes_df.attrs.get('eos_boundaries', ()))
+    spans = []; start = 0
+    for i, surface in enumerate(surfaces):
+        if i in eos_boundaries:
+            if i > start: spans.append((start, i))
+            start = i
+        if surface in SENTENCE_TERMINATORS:
+            if i > start: spans.append((start, i))
+            start = i + 1
+    if len(surfaces) > start: spans.append((start, len(surfaces)))
+    return spans
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def compute_cooccurrence_counts(text_input, target_pos_list, stop_words_set):
+    # 重い集計（対象語の出現数・ペア共起数）は閾値スライダーとは独立にキャッシュする。
+    # ペアの共起回数は他の語が閾値を超えるかどうかに依存しないので、
+    # 閾値の適用を描画側に後置しても結果は同じになる
+    morphemes_df = perform_morphological_analysis(text_input)
+    if morphemes_df.empty: return None
+    # 対象単語の判定はレポートと共通のキャッシュ済みマスクを使う
+    bases = morphemes_df['原形'].to_numpy()
+    eligible = get_morpheme_filter_mask(text_input, target_pos_list, stop_words_set,
+                                        NOUN_EXCLUDE_SUBCATEGORIES, enforce_min_length=True)
+    word_counts = pd.Series(bases[eligible]).value_counts()
+    vocab_words = word_counts.index.tolist()
+    vocab_size = len(vocab_words)
+    word_to_id = {word: i for i, word in enumerate(vocab_words)}
+    # 形態素列全体を一度だけ整数ID列へ変換しておく（フィルタ落ちは-1）。
+    # NaNなし（全トークンが語彙に載る）の場合、to_numpyは読み取り専用の
+    # ゼロコピービューを返しうるため、インプレース代入ではなくnp.whereで組み立てる
+    mapped_ids = pd.Series(bases).map(word_to_id).fillna(-1).to_numpy(dtype=np.int64)
+    morpheme_ids = np.where(eligible, mapped_ids, -1)
+    # 語彙が大きいとVxVの密行列はメモリを食いつぶすため、ペアをキー
+    # (i*V+j) の疎な列として集め、最後にnp.uniqueで一括集計する
+    # （密行列と同じ結果をO(ペア数)メモリで得る）
+    pair_key_chunks = []
+    for start, end in get_sentence_spans(text_input):
+        ids = np.unique(morpheme_ids[start:end]); ids = ids[ids >= 0]
+        if len(ids) < 2: continue
+        i_idx, j_idx = np.triu_indices(len(ids), 1)
+        pair_key_chunks.append(ids[i_idx] * vocab_size + ids[j_idx])
+    if pair_key_chunks:
+        pair_keys, pair_freqs = np.unique(np.concatenate(pair_key_chunks), return_counts=True)
+    else:
+        pair_keys = np.array([], dtype=np.int64); pair_freqs = np.array([], dtype=np.int64)
+    return vocab_words, word_counts.to_numpy(), pair_keys, pair_freqs
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def generate_cooccurrence_network_html(text_input, font_path_co, target_pos_list, stop_words_set, node_min_freq, edge_min_freq):
+    # 描画側: キャッシュ済みの集計結果に閾値フィルタを適用してHTMLを組み立てるだけ
+    computed = compute_cooccurrence_counts(text_input, target_pos_list, stop_words_set)
+    if computed is None: st.info("共起ネットワーク生成に必要なデータが不足しています。"); return None
+    if not font_file_exists(font_path_co): st.error(f"共起ネットワークのラベル表示に必要な日本語フォントパス '{font_path_co}' が見つかりません。"); return None
+    vocab_words, vocab_counts, pair_keys, pair_freqs = computed
+    vocab_size = len(vocab_words)
+    is_candidate = vocab_counts >= node_min_freq
+    candidate_ids = np.flatnonzero(is_candidate)
+    if len(candidate_ids) < 2: st.info(f"共起ネットワークのノードとなる単語（フィルタ後）が2つ未満です。"); return None
+    if len(pair_keys) == 0: st.info("共起ペアが見つかりませんでした。"); return None
+    font_name_graph = os.path.splitext(os.path.basename(font_path_co))[0]
+    if font_name_graph.lower() == 'ipagp': font_name_graph = 'IPAPGothic'
+    elif font_name_graph.lower() == 'ipamp': font_name_graph = 'IPAPMincho'
+    # pyvisのJinja2テンプレート処理（1kノードで数百ms）を経由せず、
+    # ノード/エッジをJSONにして固定のvis.js HTMLシェルへ直接埋め込む
+    # サイズ・太さはループ内のスカラーufunc呼び出し（1要素ごとにディスパッチ）ではなく
+    # 配列に対する1回のufunc呼び出しで先に計算しておく
+    node_sizes = (np.sqrt(vocab_counts[candidate_ids]) * 10 + 10).astype(np.int64)
+    nodes_data = []
+    for word_id, node_s_size in zip(candidate_ids, node_sizes):
+        word = vocab_words[word_id]; count = int(vocab_counts[word_id])
+        nodes_data.append({'id': word, 'label': word, 'size': int(node_s_size), 'title': f"{word} (出現数: {count})",
+                           'font': {'face': font_name_graph, 'size': 14, 'color': '#333333'},
+                           'borderWidth': 1, 'color': {'border': '#666666', 'background': '#D2E5FF'}})
+    # 閾値以上かつ両端がノード候補のエッジをベクトル化比較で一括取得
+    all_rows = pair_keys // vocab_size; all_cols = pair_keys % vocab_size
+    keep = (pair_freqs >= edge_min_freq) & is_candidate[all_rows] & is_candidate[all_cols]
+    if not keep.any(): st.info(f"表示対象の共起ペア（共起回数 {edge_min_freq} 回以上）がありませんでした。"); return None
+    edge_rows = all_rows[keep]; edge_cols = all_cols[keep]
+    edge_freqs = pair_freqs[keep]
+    edge_widths = np.log1p(edge_freqs) * 1.5 + 0.5
+    edges_data = []
+    for i_node, j_node, freq_cooc, edge_w in zip(edge_rows, edge_cols, edge_freqs, edge_widths):
+        freq_cooc = int(freq_cooc)
+        edges_data.append({'from': vocab_words[i_node], 'to': vocab_words[j_node], 'value': float(edge_w),
+                           'title': f"共起: {freq_cooc}回",
+                           'color': {'color': '#cccccc', 'highlight': '#848484', 'opacity': 0.6}})
+    # 安定化イテレーション数はノード数に反比例させる（大きなグラフで固定500回の
+    # barnesHut安定化はブラウザ側の描画を数十秒ブロックする）。疎な大グラフでは
+    # 収束の速いforceAtlas2Basedへ切り替える
+    n_nodes = len(nodes_data)
+    options = {**VIS_NETWORK_OPTIONS,
+               "physics": {**VIS_NETWORK_OPTIONS["physics"],
+                           "solver": "forceAtlas2Based" if n_nodes > 200 else "barnesHut",
+                           "stabilization": {"iterations": max(100, min(500, 50000 // n_nodes))}}}
+    return VIS_NETWORK_HTML_TEMPLATE.format(
+        nodes_json=json.dumps(nodes_data, ensure_ascii=False),
+        edges_json=json.dumps(edges_data, ensure_ascii=False),
+        options_json=json.dumps(options))
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_kwic_search_arrays(text_input):
+    # 検索用の小文字化済み配列と、文脈切り出し用の連結バッファ＋累積オフセットを
+    # テキスト単位で一度だけ作る（キーワードや文脈幅の変更ではキャッシュヒットする）
+    morphemes_df = perform_morphological_analysis(text_input)
+    surfaces = morphemes_df['表層形'].tolist()
+    # 小文字化もトークンごとの.lower()呼び出しではなくnumpyの一括処理で行う
+    lower_arrays = {key: np.char.lower(morphemes_df[key].to_numpy().astype('U'))
+                    for key in ('原形', '表層形')}
+    joined_surfaces = "".join(surfaces)
+    # surface_starts[i] はトークンiの連結バッファ内での開始位置（末尾に終端位置を含む）
+    surface_starts = np.concatenate(([0], np.cumsum([len(s) for s in surfaces], dtype=np.int64)))
+    # 単語→出現位置の転置インデックス。検索はO(N)走査ではなくO(ヒット数)の辞書引きになる
+    position_index = {key: pd.Series(np.arange(len(surfaces))).groupby(lower_arrays[key]).indices
+                      for key in ('原形', '表層形')}
+    return position_index, joined_surfaces, surface_starts
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def perform_kwic_search(text_input, keyword_str, search_key_type_str, window_int):
+    # 同じ検索条件の再実行（モード切替を行き来する等）では結果リストをそのまま返す
+    if not keyword_str.strip(): return []
+    position_index, joined_surfaces, surface_starts = get_kwic_search_arrays(text_input)
+    n_tokens = len(surface_starts) - 1
+    if n_tokens == 0: return []
+    # キーワードは一度だけ小文字化し、転置インデックスからヒット位置を直接引く
+    keyword_to_compare = keyword_str.lower()
+    hit_indices = position_index[search_key_type_str].get(keyword_to_compare, ())
     kwic_results_data = []
-    for i, morpheme_item in enumerate(all_morphemes):
-        # 検索キーワードと形態素の原形/表層形を比較する前に、両方を小文字化して大文字小文字を区別しないようにする
-        target_text_in_morpheme = morpheme_item[search_key_type_str].lower()
-        keyword_to_compare = keyword_str.lower()
-        
-        if target_text_in_morpheme == keyword_to_compare:
-            left_start_idx = max(0, i - window_int); left_ctx_str = "".join(m['表層形'] for m in all_morphemes[left_start_idx:i])
-            kw_surface = morpheme_item['表層形']; right_end_idx = min(len(all_morphemes), i + 1 + window_int)
-            right_ctx_str = "".join(m['表層形'] for m in all_morphemes[i+1:right_end_idx])
-            kwic_results_data.append({'左文脈': left_ctx_str, 'キーワード': kw_surface, '右文脈': right_ctx_str})
+    for i in hit_indices:
+        # 文脈はトークンのjoinではなく連結バッファのスライスでO(1)切り出し
+        left_start_idx = max(0, i - window_int); right_end_idx = min(n_tokens, i + 1 + window_int)
+        left_ctx_str = joined_surfaces[surface_starts[left_start_idx]:surface_starts[i]]
+        kw_surface = joined_surfaces[surface_starts[i]:surface_starts[i+1]]
+        right_ctx_str = joined_surfaces[surface_starts[i+1]:surface_starts[right_end_idx]]
+        kwic_results_data.append({'左文脈': left_ctx_str, 'キーワード': kw_surface, '右文脈': right_ctx_str})
     return kwic_results_data
 
 # --- Streamlit UIのメイン部分 ---
@@ -218,13 +471,20 @@ net_target_pos_selected = st.sidebar.multiselect("共起Net: 対象品詞", ['
 
 st.sidebar.markdown("**ストップワード設定**")
 # ★★★ カスタムストップワード入力のデフォルト値を空に ★★★
-custom_stopwords_input_str = st.sidebar.text_area("共通ストップワード (原形をカンマや改行区切りで入力):", 
+custom_stopwords_input_str = st.sidebar.text_area("共通ストップワード (原形をカンマや改行区切りで入力):",
                                              value="", # デフォルト値を空文字列に変更
                                              help="ここに入力した単語（原形）がストップワードとして処理されます。")
-final_stop_words_set = DEFAULT_STOP_WORDS_SET.copy() # デフォルトが空なので、実質ユーザー入力のみ
-if custom_stopwords_input_str.strip():
-    custom_list_sw = [word.strip().lower() for word in re.split(r'[,\n]', custom_stopwords_input_str) if word.strip()]
-    final_stop_words_set.update(custom_list_sw)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def compile_stopwords(raw_stopwords_str):
+    # テキストエリアの内容が変わらない限り、リランごとのsplit＋正規化を省く
+    final_set = DEFAULT_STOP_WORDS_SET.copy() # デフォルトが空なので、実質ユーザー入力のみ
+    if raw_stopwords_str.strip():
+        final_set.update(word.strip().lower() for word in STOPWORD_SPLIT_RE.split(raw_stopwords_str) if word.strip())
+    # キャッシュキーとして安定するようfrozensetに固定する
+    return frozenset(final_set)
+
+final_stop_words_set = compile_stopwords(custom_stopwords_input_str)
 st.sidebar.caption(f"適用される総ストップワード数: {len(final_stop_words_set)}")
 
 st.sidebar.markdown("---")
@@ -243,77 +503,96 @@ if analyze_button_clicked:
     elif tagger is None or not st.session_state.get('mecab_tagger_initialized', False):
         st.error("MeCab Taggerが利用できません。ページを再読み込みするか、Streamlit Cloudのログを確認してください。")
     else:
-        with st.spinner("形態素解析を実行中... しばらくお待ちください。"):
-            morphemes_data_list = perform_morphological_analysis(main_text_input_area, tagger)
-        
-        if not morphemes_data_list:
-            st.error("形態素解析に失敗したか、結果が空です。入力テキストを確認してください。")
-        else:
-            st.success(f"形態素解析が完了しました。総形態素数: {len(morphemes_data_list)}")
-            st.markdown("---")
-
-            # ★★★ 感情分析タブを削除 ★★★
-            tab_report_view, tab_wc_view, tab_network_view, tab_kwic_view = st.tabs([
-                "📊 単語出現レポート", "☁️ ワードクラウド", "🕸️ 共起ネットワーク", "🔍 KWIC検索"
-            ])
-
-            with tab_report_view:
-                st.subheader("単語出現レポート")
-                with st.spinner("レポート作成中..."):
-                    df_report_to_show, total_morphs, total_target_morphs = generate_word_report(morphemes_data_list, report_target_pos_selected, final_stop_words_set)
-                    st.caption(f"総形態素数: {total_morphs} | レポート対象の異なり語数: {len(df_report_to_show)} | レポート対象の延べ語数: {total_target_morphs}")
-                    if not df_report_to_show.empty:
-                        # ★★★ 出現数の列にミニグラフを適用 (以前のコードで正しく実装済みのはず) ★★★
-                        st.dataframe(df_report_to_show.style.bar(subset=['出現数'], align='left', color='#90EE90')
-                                     .format({'出現頻度 (%)': "{:.3f}%"}))
-                    else: 
-                        st.info("レポート対象の単語が見つかりませんでした。")
-            
-            with tab_wc_view:
-                st.subheader("ワードクラウド")
-                if FONT_PATH_FINAL:
+        # 分析対象テキストをセッションに保持し、以降のウィジェット操作による
+        # リランでも結果表示を維持する
+        st.session_state['analyzed_text'] = main_text_input_area
+        # 新しい分析では可視化タブの実行フラグをリセットする
+        st.session_state.pop('run_wordcloud', None)
+        st.session_state.pop('run_network', None)
+
+analyzed_text = st.session_state.get('analyzed_text', '')
+if analyzed_text:
+    with st.spinner("形態素解析を実行中... しばらくお待ちください。"):
+        morphemes_df = perform_morphological_analysis(analyzed_text)
+
+    if morphemes_df.empty:
+        st.error("形態素解析に失敗したか、結果が空です。入力テキストを確認してください。")
+    else:
+        st.success(f"形態素解析が完了しました。総形態素数: {len(morphemes_df)}")
+        st.markdown("---")
+
+        # ★★★ 感情分析タブを削除 ★★★
+        tab_report_view, tab_wc_view, tab_network_view, tab_kwic_view = st.tabs([
+            "📊 単語出現レポート", "☁️ ワードクラウド", "🕸️ 共起ネットワーク", "🔍 KWIC検索"
+        ])
+
+        with tab_report_view:
+            st.subheader("単語出現レポート")
+            # 大きなテキストでは全異なり語の表を組むだけで重くなるため、既定は上位のみ
+            show_all_report_rows = st.checkbox(f"全単語を表示（既定は上位{REPORT_TOP_K_DEFAULT}語）", value=False, key="report_show_all_checkbox")
+            with st.spinner("レポート作成中..."):
+                df_report_to_show, total_morphs, total_target_morphs = generate_word_report(
+                    analyzed_text, tuple(report_target_pos_selected), final_stop_words_set,
+                    top_k=None if show_all_report_rows else REPORT_TOP_K_DEFAULT)
+                st.caption(f"総形態素数: {total_morphs} | 表示語数: {len(df_report_to_show)} | レポート対象の延べ語数: {total_target_morphs}")
+                if not df_report_to_show.empty:
+                    # ★★★ 出現数の列にミニグラフを適用 (以前のコードで正しく実装済みのはず) ★★★
+                    st.dataframe(df_report_to_show.style.bar(subset=['出現数'], align='left', color='#90EE90')
+                                 .format({'出現頻度 (%)': "{:.3f}%"}))
+                else:
+                    st.info("レポート対象の単語が見つかりませんでした。")
+
+        with tab_wc_view:
+            st.subheader("ワードクラウド")
+            if FONT_PATH_FINAL:
+                # st.tabsは全タブのコードをリランごとに実行するため、重い生成処理は
+                # タブ内のボタンで明示された初回以降のみ実行する（以降はキャッシュが効く）
+                if st.session_state.get('run_wordcloud') or st.button("ワードクラウドを生成", key="run_wordcloud_button"):
+                    st.session_state['run_wordcloud'] = True
                     with st.spinner("ワードクラウド生成中..."):
-                        fig_wc_to_show = generate_wordcloud_image(morphemes_data_list, FONT_PATH_FINAL, wc_target_pos_selected, final_stop_words_set)
-                        if fig_wc_to_show: st.pyplot(fig_wc_to_show)
-                    st.caption(f"使用フォント: {os.path.basename(FONT_PATH_FINAL) if FONT_PATH_FINAL else '未設定'}")
-                else: st.error("日本語フォントの準備ができていません。ワードクラウドは表示できません。")
-            
-            with tab_network_view:
-                st.subheader("共起ネットワーク")
-                if FONT_PATH_FINAL:
+                        wc_image_to_show = generate_wordcloud_image(analyzed_text, FONT_PATH_FINAL, tuple(wc_target_pos_selected), final_stop_words_set)
+                        if wc_image_to_show is not None: st.image(wc_image_to_show, use_container_width=True)
+                    st.caption(f"使用フォント: {FONT_BASENAME_FINAL}")
+            else: st.error("日本語フォントの準備ができていません。ワードクラウドは表示できません。")
+
+        with tab_network_view:
+            st.subheader("共起ネットワーク")
+            if FONT_PATH_FINAL:
+                if st.session_state.get('run_network') or st.button("共起ネットワークを生成", key="run_network_button"):
+                    st.session_state['run_network'] = True
                     with st.spinner("共起ネットワーク生成中..."):
                         html_cooc_to_show = generate_cooccurrence_network_html(
-                            morphemes_data_list, main_text_input_area, tagger, FONT_PATH_FINAL,
-                            net_target_pos_selected, final_stop_words_set,
+                            analyzed_text, FONT_PATH_FINAL,
+                            tuple(net_target_pos_selected), final_stop_words_set,
                             network_node_min_freq_val, network_edge_min_freq_val)
                         if html_cooc_to_show: st.components.v1.html(html_cooc_to_show, height=750, scrolling=True)
-                    st.caption(f"使用フォント (ノードラベル): {os.path.basename(FONT_PATH_FINAL) if FONT_PATH_FINAL else '未設定'}")
-                else: st.error("日本語フォントの準備ができていません。共起ネットワークは表示できません。")
-            
-            with tab_kwic_view:
-                st.subheader("KWIC検索 (文脈付きキーワード検索)")
-                if 'kwic_keyword' not in st.session_state: st.session_state.kwic_keyword = ""
-                if 'kwic_mode_idx' not in st.session_state: st.session_state.kwic_mode_idx = 0
-                if 'kwic_window_val' not in st.session_state: st.session_state.kwic_window_val = 5
-
-                kwic_keyword_input_val = st.text_input("KWIC検索キーワード:", value=st.session_state.kwic_keyword, placeholder="検索したい単語(原形推奨)...", key="kwic_keyword_input_field_tab")
-                st.session_state.kwic_keyword = kwic_keyword_input_val
-
-                kwic_search_mode_options_list = ("原形一致", "表層形一致"); kwic_search_mode_selected_val = st.radio("KWIC検索モード:", kwic_search_mode_options_list, index=st.session_state.kwic_mode_idx, key="kwic_mode_radio_field_tab")
-                st.session_state.kwic_mode_idx = kwic_search_mode_options_list.index(kwic_search_mode_selected_val)
-
-                kwic_window_val_set = st.slider("KWIC表示文脈の形態素数 (前後各):", 1, 15, st.session_state.kwic_window_val, key="kwic_window_slider_field_tab")
-                st.session_state.kwic_window_val = kwic_window_val_set
-
-                if kwic_keyword_input_val.strip():
-                    search_key_type_for_kwic_val = '原形' if kwic_search_mode_selected_val == "原形一致" else '表層形'
-                    kw_to_search = kwic_keyword_input_val.strip()
-                    
-                    with st.spinner(f"「{kw_to_search}」を検索中..."):
-                        results_kwic_list_data = perform_kwic_search(morphemes_data_list, kw_to_search, search_key_type_for_kwic_val, kwic_window_val_set)
-                    if results_kwic_list_data:
-                        st.write(f"「{kw_to_search}」の検索結果 ({len(results_kwic_list_data)}件):"); df_kwic_to_display_final = pd.DataFrame(results_kwic_list_data); st.dataframe(df_kwic_to_display_final)
-                    else: st.info(f"「{kw_to_search}」は見つかりませんでした（現在の検索モードにおいて）。")
+                    st.caption(f"使用フォント (ノードラベル): {FONT_BASENAME_FINAL}")
+            else: st.error("日本語フォントの準備ができていません。共起ネットワークは表示できません。")
+
+        with tab_kwic_view:
+            st.subheader("KWIC検索 (文脈付きキーワード検索)")
+            if 'kwic_keyword' not in st.session_state: st.session_state.kwic_keyword = ""
+            if 'kwic_mode_idx' not in st.session_state: st.session_state.kwic_mode_idx = 0
+            if 'kwic_window_val' not in st.session_state: st.session_state.kwic_window_val = 5
+
+            kwic_keyword_input_val = st.text_input("KWIC検索キーワード:", value=st.session_state.kwic_keyword, placeholder="検索したい単語(原形推奨)...", key="kwic_keyword_input_field_tab")
+            st.session_state.kwic_keyword = kwic_keyword_input_val
+
+            kwic_search_mode_options_list = ("原形一致", "表層形一致"); kwic_search_mode_selected_val = st.radio("KWIC検索モード:", kwic_search_mode_options_list, index=st.session_state.kwic_mode_idx, key="kwic_mode_radio_field_tab")
+            st.session_state.kwic_mode_idx = kwic_search_mode_options_list.index(kwic_search_mode_selected_val)
+
+            kwic_window_val_set = st.slider("KWIC表示文脈の形態素数 (前後各):", 1, 15, st.session_state.kwic_window_val, key="kwic_window_slider_field_tab")
+            st.session_state.kwic_window_val = kwic_window_val_set
+
+            if kwic_keyword_input_val.strip():
+                search_key_type_for_kwic_val = '原形' if kwic_search_mode_selected_val == "原形一致" else '表層形'
+                kw_to_search = kwic_keyword_input_val.strip()
+
+                with st.spinner(f"「{kw_to_search}」を検索中..."):
+                    results_kwic_list_data = perform_kwic_search(analyzed_text, kw_to_search, search_key_type_for_kwic_val, kwic_window_val_set)
+                if results_kwic_list_data:
+                    st.write(f"「{kw_to_search}」の検索結果 ({len(results_kwic_list_data)}件):"); df_kwic_to_display_final = pd.DataFrame(results_kwic_list_data); st.dataframe(df_kwic_to_display_final)
+                else: st.info(f"「{kw_to_search}」は見つかりませんでした（現在の検索モードにおいて）。")
 
 # --- フッター情報 ---
 st.sidebar.markdown("---")